@@ -0,0 +1,42 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled splice loop for the safe-fetch MCP server.
+
+Optional drop-in for apply_spans() in safe-fetch-server.py; build with
+    python .claude/mcp/setup.py build_ext --inplace
+"""
+
+
+cpdef tuple apply_spans(str src, list spans):
+    """
+    Build the sanitized text in one join over slices of the original.
+    Spans are (start, end, rule index, replacement). They are sorted by start,
+    then rule index, so at a shared start the earliest rule wins, as in a
+    leftmost-first alternation; a span that overlaps one already kept is
+    dropped. Returns (text, num_replacements).
+    """
+    cdef Py_ssize_t start, end, last = 0, count = 0, i, n = len(spans)
+    cdef tuple span
+    cdef list parts
+
+    if n == 0:
+        return src, 0
+
+    spans.sort(key=_span_key)
+    parts = []
+    for i in range(n):
+        span = <tuple>spans[i]
+        start = span[0]
+        end = span[1]
+        if start < last:
+            continue
+        parts.append(src[last:start])
+        parts.append(<str>span[3])
+        last = end
+        count += 1
+    parts.append(src[last:])
+    return ''.join(parts), count
+
+
+def _span_key(tuple span):
+    return (span[0], span[2])
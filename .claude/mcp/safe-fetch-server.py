@@ -14,13 +14,22 @@ import json
 import sys
 import re
 import io
-from pathlib import Path
-from typing import Any
+import os
+import functools
+import atexit
+import asyncio
+from typing import Any, NamedTuple
 from urllib.parse import urlparse
 
-# Fix Windows encoding issues
-sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Fix Windows encoding issues (stdin/stdout carry raw UTF-8 bytes, see main())
+if sys.platform == 'win32':
+    import msvcrt
+    msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 # Try to import httpx, fall back to requests, then urllib
@@ -36,86 +45,468 @@ except ImportError:
         import urllib.error
         HTTP_CLIENT = 'urllib'
 
+# Optional Aho-Corasick automaton for literal patterns (pip install pyahocorasick)
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Prefer orjson for JSON-RPC framing, fall back to the stdlib json module
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    def json_loads(data: bytes) -> Any:
+        return json.loads(data)
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    JSONDecodeError = json.JSONDecodeError
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; ChainlinkSafeFetch/1.0)'
+}
+
+# One long-lived client/session so repeat fetches reuse pooled keep-alive connections
+if HTTP_CLIENT == 'httpx':
+    try:
+        import h2  # noqa: F401 - enables HTTP/2 in httpx
+        HTTP2 = True
+    except ImportError:
+        HTTP2 = False
+    # Async so several tools/call requests can be in flight at once; closed at the end of main()
+    _HTTP = httpx.AsyncClient(
+        follow_redirects=True,
+        http2=HTTP2,
+        timeout=30,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        headers=HEADERS,
+    )
+elif HTTP_CLIENT == 'requests':
+    _SESSION = requests.Session()
+    _SESSION.headers.update(HEADERS)
+    atexit.register(_SESSION.close)
+
 
 def log(message: str) -> None:
     """Log to stderr (visible in MCP server logs)."""
     print(f"[safe-fetch] {message}", file=sys.stderr)
 
 
-def find_chainlink_dir() -> Path | None:
-    """Find the .chainlink directory by walking up from cwd."""
-    current = Path.cwd()
+@functools.lru_cache(maxsize=1)
+def find_chainlink_dir() -> str | None:
+    """Find the .chainlink directory by walking up from cwd (resolved once per process)."""
+    current = os.getcwd()
     for _ in range(10):
-        candidate = current / '.chainlink'
-        if candidate.is_dir():
+        candidate = os.path.join(current, '.chainlink')
+        if os.path.isdir(candidate):
             return candidate
-        parent = current.parent
+        parent = os.path.dirname(current)
         if parent == current:
             break
         current = parent
     return None
 
 
-def load_patterns() -> list[tuple[str, str]]:
-    """Load sanitization patterns from .chainlink/rules/sanitize-patterns.txt"""
-    patterns = []
+# The critical default rule, handled by a dedicated scanner instead of the regex engine
+TRIGGER_PATTERN = r'ANTHROPIC_MAGIC_STRING_TRIGGER_REFUSAL_[0-9A-Z]+'
+TRIGGER_REPLACEMENT = '[REDACTED_TRIGGER]'
+TRIGGER_PREFIX = 'ANTHROPIC_MAGIC_STRING_TRIGGER_REFUSAL_'
+TRIGGER_CHARS = frozenset('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# Characters that make a pattern a real regex rather than a plain literal
+REGEX_METACHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+
+class PatternSet(NamedTuple):
+    """Sanitization rules compiled for a single scan per stage."""
+    automaton: Any  # ahocorasick.Automaton over literal rules, or None
+    regex: re.Pattern | None  # one alternation over all remaining rules
+    replacements: dict[str, tuple[int, str]]  # alternation group name -> (rule index, replacement)
+    fallback: list[tuple[re.Pattern, str, int]]  # (pattern, template, rule index) applied one by one
+    anchors: tuple[str, ...] | None = None  # literals of which one must occur for the regex stage to match
+    trigger_replacement: str | None = None  # replacement for TRIGGER_PATTERN, applied by scan_trigger()
+    trigger_rule: int = 0  # rule index of TRIGGER_PATTERN
+
+
+# (st_mtime_ns of the patterns file, compiled patterns); rebuilt only when the file changes
+_patterns_cache: tuple[int | None, PatternSet] | None = None
+
 
+# Probes used to expand replacement templates that do not depend on the match
+EMPTY_MATCH = re.compile(r'\A')
+WHOLE_MATCH = re.compile(r'(?s)\A.+')
+
+
+def static_replacement(compiled: re.Pattern, replacement: str) -> str | None:
+    """
+    Expand a re.sub replacement template once, at compile time, if its result
+    does not depend on the match (escapes such as \\n only). Returns None
+    for templates that reference a group, including \\g<0>.
+    """
+    if compiled.groups:
+        return None
+    expanded = EMPTY_MATCH.sub(replacement, '')
+    if WHOLE_MATCH.sub(replacement, '\0') != expanded:
+        return None
+    return expanded
+
+
+def compile_patterns(raw_patterns: list[tuple[str, str]]) -> PatternSet:
+    """
+    Compile (regex, replacement) pairs into a PatternSet.
+    Every replacement is a re.sub template, whichever stage applies the rule.
+    Templates that do not depend on the match are expanded here, once.
+    Literal patterns go into an Aho-Corasick automaton when pyahocorasick is
+    available, and everything else is fused into one named-group alternation.
+    Rules whose templates reference the match are scanned one by one.
+    Invalid regexes and templates are logged and skipped.
+    TRIGGER_PATTERN is handled by scan_trigger() instead, unless its template
+    references the match.
+    Every stage tags its matches with the rule's index in raw_patterns, so
+    when rules match at the same position the earliest rule wins, whichever
+    stage ran it.
+    """
+    trigger_replacement = None
+    trigger_rule = 0
+    valid = []
+    for index, (pattern, replacement) in enumerate(raw_patterns):
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            log(f"Invalid regex pattern '{pattern}': {e}")
+            continue
+        try:
+            compiled.sub(replacement, '')  # parses the template and checks its group references
+        except re.error as e:
+            log(f"Invalid replacement for pattern '{pattern}': {e}")
+            continue
+        static = static_replacement(compiled, replacement)
+        if pattern == TRIGGER_PATTERN and static is not None:
+            if trigger_replacement is None:
+                trigger_replacement, trigger_rule = static, index
+            continue
+        valid.append((compiled, replacement, static, index))
+
+    literals = []
+    regexes = []
+    for compiled, replacement, static, index in valid:
+        pattern = compiled.pattern
+        if ahocorasick is not None and static is not None and not REGEX_METACHARACTERS.intersection(pattern):
+            literals.append((pattern, static, index))
+        else:
+            regexes.append((compiled, replacement, static, index))
+
+    automaton = None
+    if literals:
+        automaton = ahocorasick.Automaton()
+        for literal, replacement, index in literals:
+            # A repeated literal can never win against its first occurrence
+            if not automaton.exists(literal):
+                automaton.add_word(literal, (len(literal), index, replacement))
+        automaton.make_automaton()
+
+    # Rules with their own groups would clash with the g<i> wrapper groups (duplicate
+    # names, shifted backreference numbers) and global inline flags cannot be nested,
+    # so such rules are scanned one by one instead of joining the alternation. So are
+    # rules whose template needs the match; groups always imply that.
+    combinable = []
+    fallback = []
+    for compiled, replacement, static, index in regexes:
+        if static is None or compiled.flags & ~re.UNICODE:
+            fallback.append((compiled, replacement, index))
+        else:
+            combinable.append((compiled, replacement, static, index))
+
+    regex = None
+    replacements = {}
+    if combinable:
+        replacements = {f'g{i}': (index, static) for i, (_, _, static, index) in enumerate(combinable)}
+        try:
+            regex = re.compile('|'.join(
+                f'(?P<g{i}>{compiled.pattern})' for i, (compiled, _, _, _) in enumerate(combinable)
+            ))
+        except re.error as e:
+            log(f"Could not combine patterns, applying them one by one: {e}")
+            replacements = {}
+            fallback = [(compiled, replacement, index) for compiled, replacement, _, index in combinable] + fallback
+
+    return PatternSet(
+        automaton, regex, replacements, fallback,
+        anchors=find_anchors([(compiled, replacement) for compiled, replacement, _, _ in regexes]),
+        trigger_replacement=trigger_replacement,
+        trigger_rule=trigger_rule,
+    )
+
+
+def scan_trigger(content: str) -> list[tuple[int, int]]:
+    """
+    Find TRIGGER_PATTERN matches without the regex engine: str.find for the
+    fixed prefix, then a short loop over the [0-9A-Z] tail.
+    """
+    spans = []
+    prefix_len = len(TRIGGER_PREFIX)
+    length = len(content)
+    start = content.find(TRIGGER_PREFIX)
+    while start >= 0:
+        end = start + prefix_len
+        while end < length and content[end] in TRIGGER_CHARS:
+            end += 1
+        if end > start + prefix_len:
+            spans.append((start, end))
+        start = content.find(TRIGGER_PREFIX, end)
+    return spans
+
+
+def required_literal(compiled: re.Pattern) -> str | None:
+    """
+    Return the longest literal run that every match of the pattern must contain,
+    taken from the top level of its parse tree, or None if there is none.
+    """
+    parsed = sre_parse.parse(compiled.pattern, compiled.flags)
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+
+    best = ''
+    run = []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+        if len(run) > len(best):
+            best = ''.join(run)
+        run = []
+    if len(run) > len(best):
+        best = ''.join(run)
+    return best or None
+
+
+def find_anchors(patterns: list[tuple[re.Pattern, str]]) -> tuple[str, ...] | None:
+    """Required literals for a group of rules, or None if any rule lacks one."""
+    anchors = []
+    for compiled, _ in patterns:
+        literal = required_literal(compiled)
+        if literal is None:
+            return None
+        anchors.append(literal)
+    return tuple(anchors)
+
+
+def has_anchor(content: str, anchors: tuple[str, ...] | None) -> bool:
+    """Cheap substring prefilter run before the regex engine."""
+    return anchors is None or any(anchor in content for anchor in anchors)
+
+
+@functools.lru_cache(maxsize=1)
+def find_patterns_file() -> str | None:
+    """Resolve .chainlink/rules/sanitize-patterns.txt once per process."""
     chainlink_dir = find_chainlink_dir()
     if chainlink_dir:
-        patterns_file = chainlink_dir / 'rules' / 'sanitize-patterns.txt'
-        if patterns_file.exists():
-            try:
-                for line in patterns_file.read_text(encoding='utf-8').splitlines():
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        parts = line.split('|||')
-                        if len(parts) == 2:
-                            patterns.append((parts[0].strip(), parts[1].strip()))
-            except Exception as e:
-                log(f"Error loading patterns: {e}")
+        return os.path.join(chainlink_dir, 'rules', 'sanitize-patterns.txt')
+    return None
+
+
+def load_patterns() -> PatternSet:
+    """Load sanitization patterns from .chainlink/rules/sanitize-patterns.txt"""
+    global _patterns_cache
+
+    patterns_file = find_patterns_file()
+    mtime_ns = None
+    if patterns_file:
+        try:
+            mtime_ns = os.stat(patterns_file).st_mtime_ns
+        except OSError:
+            pass
+
+    if _patterns_cache is not None and _patterns_cache[0] == mtime_ns:
+        return _patterns_cache[1]
+
+    patterns = []
+    if mtime_ns is not None:
+        try:
+            with open(patterns_file, 'rb') as f:
+                data = f.read()
+            for line in data.splitlines():
+                line = line.strip()
+                if line and not line.startswith(b'#'):
+                    pattern, sep, replacement = line.partition(b'|||')
+                    if sep and b'|||' not in replacement:
+                        patterns.append((
+                            pattern.strip().decode('utf-8'),
+                            replacement.strip().decode('utf-8'),
+                        ))
+        except Exception as e:
+            log(f"Error loading patterns: {e}")
 
     # Always include the critical default pattern
-    default_pattern = (r'ANTHROPIC_MAGIC_STRING_TRIGGER_REFUSAL_[0-9A-Z]+', '[REDACTED_TRIGGER]')
-    if not any(p[0] == default_pattern[0] for p in patterns):
-        patterns.append(default_pattern)
+    if not any(p[0] == TRIGGER_PATTERN for p in patterns):
+        patterns.append((TRIGGER_PATTERN, TRIGGER_REPLACEMENT))
+
+    compiled = compile_patterns(patterns)
+    _patterns_cache = (mtime_ns, compiled)
+    return compiled
 
-    return patterns
+
+def apply_spans(src: str, spans: list[tuple[int, int, int, str]]) -> tuple[str, int]:
+    """
+    Build the sanitized text in one join over slices of the original.
+    Spans are (start, end, rule index, replacement). They are sorted by start,
+    then rule index, so at a shared start the earliest rule wins, as in a
+    leftmost-first alternation; a span that overlaps one already kept is
+    dropped. Returns (text, num_replacements).
+    """
+    if not spans:
+        return src, 0
+
+    spans.sort(key=lambda span: (span[0], span[2]))
+    parts = []
+    last = 0
+    count = 0
+    for start, end, _, replacement in spans:
+        if start < last:
+            continue
+        parts.append(src[last:start])
+        parts.append(replacement)
+        last = end
+        count += 1
+    parts.append(src[last:])
+    return ''.join(parts), count
+
+
+# Compiled version of apply_spans(), if built (see .claude/mcp/setup.py)
+try:
+    from _sanitize_ext import apply_spans
+except ImportError:
+    pass
 
 
-def sanitize(content: str, patterns: list[tuple[str, str]]) -> tuple[str, int]:
+def sanitize(content: str, patterns: PatternSet) -> tuple[str, int]:
     """
     Apply sanitization patterns to content.
+    Every stage only records (start, end, replacement) spans against the
+    original text; the output is built once at the end by apply_spans().
+    Replacements are re.sub templates in every stage: pre-expanded by
+    compile_patterns() where they do not depend on the match, expanded per
+    match on the per-rule path otherwise.
     Returns (sanitized_content, num_replacements).
     """
-    total_replacements = 0
-    for pattern, replacement in patterns:
-        try:
-            content, count = re.subn(pattern, replacement, content)
-            total_replacements += count
-        except re.error as e:
-            log(f"Invalid regex pattern '{pattern}': {e}")
-    return content, total_replacements
+    spans = []
+
+    # Stage 0: the default trigger rule via its dedicated scanner
+    if patterns.trigger_replacement is not None:
+        rule = patterns.trigger_rule
+        spans.extend((start, end, rule, patterns.trigger_replacement) for start, end in scan_trigger(content))
+
+    # Most pages contain none of the rules' required literals; skip the regex engine then
+    regex_stage = has_anchor(content, patterns.anchors)
+
+    # Stage 1: all literal patterns in one linear Aho-Corasick scan; every match is
+    # kept, overlapping or not, so apply_spans() can pick by rule order
+    if patterns.automaton is not None:
+        for end_index, (length, rule, replacement) in patterns.automaton.iter(content):
+            spans.append((end_index - length + 1, end_index + 1, rule, replacement))
+
+    if regex_stage:
+        # Stage 2: all regex patterns in one pass of the combined alternation
+        if patterns.regex is not None:
+            replacements = patterns.replacements
+            spans.extend(
+                (match.start(), match.end(), *replacements[match.lastgroup])
+                for match in patterns.regex.finditer(content)
+            )
+
+        for pattern, replacement, rule in patterns.fallback:
+            spans.extend(
+                (match.start(), match.end(), rule, match.expand(replacement))
+                for match in pattern.finditer(content)
+            )
+
+    return apply_spans(content, spans)
+
+
+# Read size for streamed response bodies
+CHUNK_SIZE = 65536
+
+# Media types whose bodies are fetched, sanitized and returned as text
+TEXT_CONTENT_TYPES = (
+    'text/', 'application/json', 'application/xml', 'application/xhtml',
+    'application/javascript', 'application/ecmascript',
+)
+
+
+def is_text_content(content_type: str) -> bool:
+    """True for textual media types, or when the server sent no Content-Type."""
+    media_type = content_type.partition(';')[0].strip().lower()
+    return (
+        not media_type
+        or media_type.startswith(TEXT_CONTENT_TYPES)
+        or media_type.endswith(('+json', '+xml'))
+    )
+
+
+def decode_body(body: bytes | bytearray, encoding: str | None) -> str:
+    """Decode a fetched body once, falling back to UTF-8 for unknown charsets."""
+    try:
+        return str(body, encoding or 'utf-8', 'replace')
+    except LookupError:
+        return str(body, 'utf-8', 'replace')
 
 
-def fetch_url(url: str) -> str:
-    """Fetch content from URL using available HTTP client."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (compatible; ChainlinkSafeFetch/1.0)'
-    }
+async def fetch_httpx(url: str) -> tuple[str, str | None]:
+    """Fetch content from URL with the shared httpx.AsyncClient.
 
-    if HTTP_CLIENT == 'httpx':
-        with httpx.Client(follow_redirects=True, timeout=30) as client:
-            response = client.get(url, headers=headers)
-            response.raise_for_status()
-            return response.text
-    elif HTTP_CLIENT == 'requests':
-        response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
+    Returns (content_type, text); text is None for non-text content, whose
+    body is never downloaded. Text bodies are streamed into a single
+    bytearray and decoded once, rather than letting the client buffer the
+    bytes and then build its own text copy.
+    """
+    body = bytearray()
+    async with _HTTP.stream('GET', url) as response:
         response.raise_for_status()
-        return response.text
-    else:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return response.read().decode('utf-8', errors='replace')
+        content_type = response.headers.get('content-type', '')
+        if not is_text_content(content_type):
+            return content_type, None
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            body += chunk
+        return content_type, decode_body(body, response.encoding)
+
+
+def fetch_requests(url: str) -> tuple[str, str | None]:
+    """Fetch content from URL with the shared requests.Session (blocking)."""
+    body = bytearray()
+    with _SESSION.get(url, timeout=30, allow_redirects=True, stream=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '')
+        if not is_text_content(content_type):
+            return content_type, None
+        for chunk in response.iter_content(CHUNK_SIZE):
+            body += chunk
+        return content_type, decode_body(body, response.encoding)
+
+
+def fetch_urllib(url: str) -> tuple[str, str | None]:
+    """Fetch content from URL with urllib (blocking)."""
+    req = urllib.request.Request(url, headers=HEADERS)
+    with urllib.request.urlopen(req, timeout=30) as response:
+        content_type = response.headers.get('Content-Type', '')
+        if not is_text_content(content_type):
+            return content_type, None
+        return content_type, decode_body(response.read(), None)
+
+
+# Pick the fetch implementation once; `await fetch_url(url)` works for all three,
+# with the blocking backends run on a worker thread
+if HTTP_CLIENT == 'httpx':
+    fetch_url = fetch_httpx
+elif HTTP_CLIENT == 'requests':
+    fetch_url = functools.partial(asyncio.to_thread, fetch_requests)
+else:
+    fetch_url = functools.partial(asyncio.to_thread, fetch_urllib)
 
 
 def validate_url(url: str) -> str | None:
@@ -131,7 +522,7 @@ def validate_url(url: str) -> str | None:
         return f"Invalid URL: {e}"
 
 
-def handle_safe_fetch(arguments: dict[str, Any]) -> dict[str, Any]:
+async def handle_safe_fetch(arguments: dict[str, Any]) -> dict[str, Any]:
     """Handle the safe_fetch tool call."""
     url = arguments.get('url', '')
     prompt = arguments.get('prompt', 'Extract the main content')
@@ -145,21 +536,28 @@ def handle_safe_fetch(arguments: dict[str, Any]) -> dict[str, Any]:
         }
 
     try:
-        # Fetch content
-        raw_content = fetch_url(url)
+        # Fetch content; non-text responses are rejected without reading the body
+        content_type, raw_content = await fetch_url(url)
+        if raw_content is None:
+            return {
+                'content': [{'type': 'text', 'text': f"Error: Unsupported content type: {content_type}. Only text content can be fetched."}],
+                'isError': True
+            }
 
         # Load patterns and sanitize
         patterns = load_patterns()
         clean_content, num_sanitized = sanitize(raw_content, patterns)
 
-        # Build response
-        result_text = clean_content
+        # Build response; the note goes in its own content item so the
+        # (possibly multi-MB) page text is never copied just to prepend it
+        content = [{'type': 'text', 'text': clean_content}]
         if num_sanitized > 0:
-            result_text = f"[Note: {num_sanitized} potentially malicious string(s) were sanitized from this content]\n\n{clean_content}"
+            note = f"[Note: {num_sanitized} potentially malicious string(s) were sanitized from this content]\n\n"
+            content.insert(0, {'type': 'text', 'text': note})
             log(f"Sanitized {num_sanitized} pattern(s) from {url}")
 
         return {
-            'content': [{'type': 'text', 'text': result_text}]
+            'content': content
         }
 
     except Exception as e:
@@ -193,7 +591,7 @@ TOOL_DEFINITION = {
 }
 
 
-def handle_request(request: dict[str, Any]) -> dict[str, Any]:
+async def handle_request(request: dict[str, Any]) -> dict[str, Any]:
     """Handle an MCP JSON-RPC request."""
     method = request.get('method', '')
     request_id = request.get('id')
@@ -233,7 +631,7 @@ def handle_request(request: dict[str, Any]) -> dict[str, Any]:
         arguments = params.get('arguments', {})
 
         if tool_name == 'safe_fetch':
-            result = handle_safe_fetch(arguments)
+            result = await handle_safe_fetch(arguments)
             return {
                 'jsonrpc': '2.0',
                 'id': request_id,
@@ -260,13 +658,51 @@ def handle_request(request: dict[str, Any]) -> dict[str, Any]:
         }
 
 
-def main():
-    """Main MCP server loop - reads JSON-RPC from stdin, writes to stdout."""
+STDOUT_FD = sys.stdout.fileno()
+
+
+def write_message(message: dict[str, Any]) -> None:
+    """Write one JSON-RPC message as a single line of UTF-8 straight to the stdout fd."""
+    data = memoryview(json_dumps(message) + b'\n')
+    while data:
+        data = data[os.write(STDOUT_FD, data):]
+
+
+async def dispatch(request: dict[str, Any]) -> None:
+    """Handle one request and write its response, independently of other requests."""
+    try:
+        response = await handle_request(request)
+    except Exception as e:
+        log(f"Unexpected error: {e}")
+        response = {
+            'jsonrpc': '2.0',
+            'id': request.get('id') if isinstance(request, dict) else None,
+            'error': {
+                'code': -32603,
+                'message': 'Internal error'
+            }
+        }
+
+    # write_message() never yields to the event loop, so responses cannot interleave
+    if response is not None:
+        write_message(response)
+
+
+async def main():
+    """Main MCP server loop - reads JSON-RPC from stdin, writes to stdout.
+
+    Each request is handled in its own task, so a slow fetch does not hold up
+    reading and answering the requests behind it.
+    """
     log("Starting safe-fetch MCP server")
+    loop = asyncio.get_running_loop()
+    pending = set()
 
     while True:
         try:
-            line = sys.stdin.readline()
+            # A reader thread keeps this portable to Windows, where stdin pipes
+            # cannot be attached to the event loop
+            line = await loop.run_in_executor(None, sys.stdin.buffer.readline)
             if not line:
                 break
 
@@ -274,13 +710,12 @@ def main():
             if not line:
                 continue
 
-            request = json.loads(line)
-            response = handle_request(request)
+            request = json_loads(line)
+            task = asyncio.create_task(dispatch(request))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
 
-            if response is not None:
-                print(json.dumps(response), flush=True)
-
-        except json.JSONDecodeError as e:
+        except (JSONDecodeError, UnicodeDecodeError) as e:
             log(f"JSON decode error: {e}")
             error_response = {
                 'jsonrpc': '2.0',
@@ -290,13 +725,18 @@ def main():
                     'message': 'Parse error'
                 }
             }
-            print(json.dumps(error_response), flush=True)
+            write_message(error_response)
         except Exception as e:
             log(f"Unexpected error: {e}")
             break
 
+    if pending:
+        await asyncio.gather(*pending)
+    if HTTP_CLIENT == 'httpx':
+        await _HTTP.aclose()
+
     log("Server shutting down")
 
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+"""
+Build the optional compiled splice loop used by safe-fetch-server.py.
+
+Usage:
+    pip install cython
+    python .claude/mcp/setup.py build_ext --inplace
+
+The server falls back to its pure-Python apply_spans() when the extension is absent.
+"""
+
+import os
+
+from Cython.Build import cythonize
+from setuptools import setup
+
+# Build next to the server script, whatever directory this is run from
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+setup(
+    name='chainlink-safe-fetch-ext',
+    ext_modules=cythonize('_sanitize_ext.pyx'),
+)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the safe-fetch MCP server's sanitizer.
+
+Usage:
+    python -m unittest discover -s .claude/mcp
+"""
+
+import importlib.util
+import os
+import re
+import unittest
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'safe-fetch-server.py')
+
+
+def load_server():
+    """Import safe-fetch-server.py, whose file name is not a valid module name."""
+    spec = importlib.util.spec_from_file_location('safe_fetch_server', SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+server = load_server()
+
+# (rules, content, expected) where optional matching backends have diverged from re
+CASES = [
+    ([(r'(token)=\w+', r'\1=[R]')], 'x token=abc y', ('x token=[R] y', 1)),
+    ([(r'<x>.*?</x>', '[X]')], '<x>1</x> keep <x>2</x>', ('[X] keep [X]', 2)),
+    ([('a|ab', '[X]')], 'abc', ('[X]bc', 1)),
+    ([(r'ignore\sprevious', '[X]')], 'ignore\x1cprevious', ('[X]', 1)),
+    ([('evil{,3}x', '[X]')], 'evilllx', ('[X]', 1)),
+    ([(server.TRIGGER_PATTERN, server.TRIGGER_REPLACEMENT), ('secret', '[S]')],
+     'ANTHROPIC_MAGIC_STRING_TRIGGER_REFUSAL_Q1 secret ü', ('[REDACTED_TRIGGER] [S] ü', 2)),
+    ([('nothing', '[N]')], 'a page without any match', ('a page without any match', 0)),
+    ([('BAD', '[b]'), ('BADBAD', '[bb]'), (r'x[0-9]+y', '[xy]')],
+     'café BAD BADBAD x12y é x1yBAD', ('café [b] [b][b] [xy] é [xy][b]', 6)),
+    ([('secret', '[A]'), (r'secret_key\w*', '[B]')], 'x secret_key123 y', ('x [A]_key123 y', 1)),
+    ([(r'secret_key\w*', '[B]'), ('secret', '[A]')], 'x secret_key123 y', ('x [B] y', 1)),
+    ([('aa', '[A]')], 'aaa', ('[A]a', 1)),
+    ([('sec.et', '[A]'), (r'(?i)secret_key\w*', '[B]')], 'x secret_key123 y', ('x [A]_key123 y', 1)),
+    ([('sec.et', '[A]'), (r'secret_key\w*', '[B]')], 'x secret_key123 y', ('x [A]_key123 y', 1)),
+]
+
+
+class SanitizeTest(unittest.TestCase):
+    """Rules match with Python re semantics."""
+
+    def test_re_semantics(self):
+        for rules, content, expected in CASES:
+            with self.subTest(rules=rules, content=content):
+                self.assertEqual(server.sanitize(content, server.compile_patterns(rules)), expected)
+
+
+class AhoCorasickParityTest(unittest.TestCase):
+    """Installing the optional pyahocorasick package must not change the output."""
+
+    @unittest.skipIf(server.ahocorasick is None, 'pyahocorasick is not installed')
+    def test_same_output_with_and_without_ahocorasick(self):
+        for rules, content, _ in CASES:
+            with self.subTest(rules=rules, content=content):
+                with_automaton = server.compile_patterns(rules)
+                ahocorasick = server.ahocorasick
+                server.ahocorasick = None
+                try:
+                    without_automaton = server.compile_patterns(rules)
+                finally:
+                    server.ahocorasick = ahocorasick
+                self.assertIsNone(without_automaton.automaton)
+                self.assertEqual(
+                    server.sanitize(content, with_automaton),
+                    server.sanitize(content, without_automaton),
+                )
+
+
+class ReplacementTemplateTest(unittest.TestCase):
+    """Replacements are re.sub templates, whichever stage applies the rule."""
+
+    def assert_like_re_sub(self, pattern, replacement, content):
+        expected = re.subn(pattern, replacement, content)
+        self.assertEqual(server.sanitize(content, server.compile_patterns([(pattern, replacement)])), expected)
+
+    def test_escapes_expand_for_every_rule_shape(self):
+        self.assert_like_re_sub('secret', r'[A]\n[B]', 'a secret')
+        self.assert_like_re_sub('(?i)secret', r'[A]\n[B]', 'a SECRET')
+        self.assert_like_re_sub('sec.et', r'[A]\n[B]', 'a secret')
+        self.assert_like_re_sub(server.TRIGGER_PATTERN, r'[T]\t', 'ANTHROPIC_MAGIC_STRING_TRIGGER_REFUSAL_A')
+
+    def test_match_references(self):
+        self.assert_like_re_sub('secret', r'<\g<0>>', 'a secret')
+        self.assert_like_re_sub(r'(token)=\w+', r'\1=[R]', 'x token=abc y')
+        self.assert_like_re_sub(server.TRIGGER_PATTERN, r'[\g<0>]', 'x ANTHROPIC_MAGIC_STRING_TRIGGER_REFUSAL_A')
+
+    def test_invalid_group_reference_skips_rule(self):
+        patterns = server.compile_patterns([('secret', r'\1')])
+        self.assertEqual(server.sanitize('a secret', patterns), ('a secret', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()